@@ -1,20 +1,60 @@
 import requests
 import time
-import json
+import math
+import random
+import signal
+import threading
+import http.server
+import socketserver
 import os
 from datetime import datetime
-import hashlib
-from bs4 import BeautifulSoup
+from email.utils import parsedate_to_datetime
+from hashlib import blake2b
+import lxml.html
+from lxml import etree
 import re
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urljoin
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+# Returned by get_page_content when the page has not changed since the last check
+UNCHANGED = object()
 
 class IMATSlotMonitor:
+    # Color codes that may appear in inline styles, mapped to status colors
+    COLOR_CODES = {
+        '#ff0000': 'red',
+        '#00ff00': 'green',
+        '#ffff00': 'yellow',
+        'rgb(255,0,0)': 'red',
+        'rgb(0,255,0)': 'green',
+        'rgb(255,255,0)': 'yellow',
+    }
+
+    # Status words shown next to a city, mapped to status colors
+    STATUS_KEYWORDS = {
+        'available': 'green',
+        'limited': 'yellow',
+        'full': 'red',
+        'closed': 'red'
+    }
+
     def __init__(self):
         # Get these from Replit Secrets
         self.telegram_bot_token = os.getenv('TELEGRAM_BOT_TOKEN')
         self.telegram_chat_id = os.getenv('TELEGRAM_CHAT_ID')
+        self._telegram_url = f"https://api.telegram.org/bot{self.telegram_bot_token}/sendMessage"
+        
+        # Separate keep-alive session so alerts reuse one TLS connection to Telegram
+        self.telegram_session = requests.Session()
+        
+        # Background worker so alert delivery never delays the next check
+        self._notifier = ThreadPoolExecutor(max_workers=1, thread_name_prefix='telegram')
         
         # IMAT registration URL (you may need to update this)
         self.imat_url = "https://www.nta.ac.in/IMAT"  # Replace with actual IMAT URL
+        self.base_url = '/'.join(self.imat_url.split('/')[:3])
         
         # Session state management
         self.login_url = None  # Will be determined automatically
@@ -29,10 +69,65 @@ class IMATSlotMonitor:
         
         # Cities to monitor
         self.cities = ['chennai', 'delhi']
+        self.city_titles = {city: city.title() for city in self.cities}
+        
+        # Matchers compiled once and reused on every poll
+        self._redirect_re = re.compile(r'login|signin|country', re.I)
+        self._color_re = re.compile(
+            r'red|green|yellow|#ff0000|#00ff00|#ffff00|rgb\(255,0,0\)|rgb\(0,255,0\)|rgb\(255,255,0\)',
+            re.I
+        )
+        
+        # First opening tag whose class or id mentions each city, matched on the raw bytes
+        self._city_tag_re = {
+            city: re.compile(
+                rb'<[a-z][^\s>]*(?:\s[^>]*?)?\s(?:class|id)\s*=\s*["\'][^"\'>]*' + re.escape(city.encode()) + rb'[^>]*>',
+                re.I
+            )
+            for city in self.cities
+        }
+        # Raw spans lxml never turns into elements (an unterminated one runs to the end of the page)
+        self._non_element_re = re.compile(
+            rb'<!--.*?(?:-->|\Z)|<(script|style)\b.*?(?:</\1\s*>|\Z)',
+            re.I | re.S
+        )
+        self._tag_attr_re = re.compile(rb'\s(class|style)\s*=\s*(["\'])(.*?)\2', re.I | re.S)
+        
+        # XPath queries over the parsed slot page, evaluated with $city in lower case
+        lower_case = "translate({}, 'ABCDEFGHIJKLMNOPQRSTUVWXYZ', 'abcdefghijklmnopqrstuvwxyz')"
+        self._city_element_xpath = etree.XPath(
+            f"//*[contains({lower_case.format('@class')}, $city) or contains({lower_case.format('@id')}, $city)]"
+            "/descendant-or-self::*[@*]"
+        )
+        self._city_text_parent_xpath = etree.XPath(f"//text()[contains({lower_case.format('.')}, $city)]/..")
         
         # Session for connection pooling and cookie management
         self.session = requests.Session()
         
+        # Candidate slot pages are probed in small parallel batches
+        self.probe_workers = 2
+        
+        # Validators from the last fetched slot page, used for conditional requests
+        self._etag = None
+        self._last_modified = None
+        self._last_digest = None
+        
+        # Median delay between checks in seconds (the actual delay is jittered around it)
+        self.business_hours_median_wait = 150
+        self.off_hours_median_wait = 240
+        
+        # Polling state: how many checks in a row were rate limited
+        self._consecutive_rate_limits = 0
+        self._consecutive_forbidden = 0
+        self.forbidden_reinit_after = 2  # a repeated 403 may mean an expired session/CSRF token
+        self._retry_not_before = 0.0  # time.monotonic() deadline from the last Retry-After
+        
+        # Set to cut the wait between checks short for an on-demand check; shutdown
+        # is a plain flag the wait polls every stop_poll_interval seconds
+        self._wake = threading.Event()
+        self._stop_requested = False
+        self.stop_poll_interval = 1
+        
         # Counter for cache busting
         self.request_counter = 0
         
@@ -45,7 +140,7 @@ class IMATSlotMonitor:
             'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
             'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/avif,image/webp,image/apng,*/*;q=0.8,application/signed-exchange;v=b3;q=0.7',
             'Accept-Language': 'en-US,en;q=0.9',
-            'Accept-Encoding': 'gzip, deflate, br',
+            'Accept-Encoding': 'gzip, deflate',
             'Sec-Fetch-Dest': 'document',
             'Sec-Fetch-Mode': 'navigate',
             'Sec-Fetch-Site': 'none',
@@ -53,6 +148,23 @@ class IMATSlotMonitor:
             'Upgrade-Insecure-Requests': '1',
             'Connection': 'keep-alive',
         }
+        self.session.headers.update(self.base_headers)
+        
+        # Keep a small pool of persistent connections and retry transient failures.
+        # 429/503 are left to get_page_content so Retry-After never blocks inside a request.
+        adapter = HTTPAdapter(
+            pool_connections=4,
+            pool_maxsize=4,
+            max_retries=Retry(
+                total=3,
+                backoff_factor=0.5,
+                status_forcelist=[500, 502, 504],
+                respect_retry_after_header=False,  # otherwise urllib3 retries 429/503 with Retry-After itself
+                raise_on_status=False  # hand the final response back to the caller's status checks
+            )
+        )
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
 
     def send_telegram_message(self, message):
         """Send notification to Telegram"""
@@ -60,7 +172,6 @@ class IMATSlotMonitor:
             print("❌ Telegram credentials not found in environment variables")
             return False
             
-        url = f"https://api.telegram.org/bot{self.telegram_bot_token}/sendMessage"
         payload = {
             'chat_id': self.telegram_chat_id,
             'text': message,
@@ -68,7 +179,7 @@ class IMATSlotMonitor:
         }
         
         try:
-            response = requests.post(url, data=payload, timeout=10)
+            response = self.telegram_session.post(self._telegram_url, data=payload, timeout=10)
             if response.status_code == 200:
                 print("✅ Telegram notification sent successfully")
                 return True
@@ -79,37 +190,43 @@ class IMATSlotMonitor:
             print(f"❌ Error sending Telegram message: {str(e)}")
             return False
 
-    def get_fresh_headers(self, form_submit=False):
-        """Generate fresh headers with cache-busting"""
-        headers = self.base_headers.copy()
-        
-        if form_submit:
-            # Headers for form submissions
-            headers.update({
-                'Content-Type': 'application/x-www-form-urlencoded',
-                'Origin': '/'.join(self.imat_url.split('/')[:3]),
-                'Referer': self.imat_url,
-                'Sec-Fetch-Dest': 'document',
-                'Sec-Fetch-Mode': 'navigate',
-                'Sec-Fetch-Site': 'same-origin',
-                'Sec-Fetch-User': '?1',
-            })
-        else:
-            # Regular page load headers
-            headers.update({
-                'Cache-Control': 'max-age=0',
-                'Sec-Fetch-Dest': 'document',
-                'Sec-Fetch-Mode': 'navigate',
-                'Sec-Fetch-Site': 'same-origin' if self.session_initialized else 'none',
-                'Sec-Fetch-User': '?1',
-            })
-            
-            if self.session_initialized:
-                headers['Referer'] = self.imat_url
-        
+    def notify(self, message):
+        """Queue a Telegram message on the background notifier"""
+        return self._notifier.submit(self.send_telegram_message, message)
+
+    def get_page_headers(self):
+        """Cache-busting headers for a page load (merged over the session headers)"""
+        if self.session_initialized:
+            return {'Cache-Control': 'max-age=0', 'Referer': self.imat_url, 'Sec-Fetch-Site': 'same-origin'}
+        return {'Cache-Control': 'max-age=0'}
+
+    def get_form_headers(self):
+        """Headers for a form submission (merged over the session headers)"""
+        return {
+            'Content-Type': 'application/x-www-form-urlencoded',
+            'Origin': self.base_url,
+            'Referer': self.imat_url,
+            'Sec-Fetch-Site': 'same-origin',
+        }
+
+    def get_conditional_headers(self):
+        """Page load headers plus validators from the last fetched slot page"""
+        headers = self.get_page_headers()
+        if self._etag:
+            headers['If-None-Match'] = self._etag
+        if self._last_modified:
+            headers['If-Modified-Since'] = self._last_modified
         return headers
 
-    def login_to_system(self):
+    def fetch_landing_page(self):
+        """Fetch and parse the IMAT landing page"""
+        # Imported on first use: only session setup needs BeautifulSoup
+        from bs4 import BeautifulSoup
+        
+        response = self.session.get(self.imat_url, headers=self.get_page_headers())
+        return BeautifulSoup(response.content, 'lxml')
+
+    def login_to_system(self, soup):
         """Handle login process if credentials are provided"""
         if not self.username or not self.password:
             print("⚠️ No login credentials provided - attempting without login")
@@ -118,10 +235,6 @@ class IMATSlotMonitor:
         try:
             print("🔐 Attempting to login...")
             
-            # Get login page first
-            response = self.session.get(self.imat_url, headers=self.get_fresh_headers())
-            soup = BeautifulSoup(response.text, 'html.parser')
-            
             # Look for login form
             login_form = soup.find('form', {'id': 'loginForm'}) or soup.find('form', action=lambda x: x and 'login' in x.lower())
             
@@ -130,9 +243,7 @@ class IMATSlotMonitor:
                 action = login_form.get('action', '')
                 method = login_form.get('method', 'POST').upper()
                 
-                if not action.startswith('http'):
-                    base_url = '/'.join(self.imat_url.split('/')[:3])
-                    action = base_url + action
+                action = urljoin(self.imat_url, action)
                 
                 # Prepare login data
                 login_data = {
@@ -148,7 +259,7 @@ class IMATSlotMonitor:
                         login_data[name] = value
                 
                 # Submit login
-                login_response = self.session.post(action, data=login_data, headers=self.get_fresh_headers(form_submit=True))
+                login_response = self.session.post(action, data=login_data, headers=self.get_form_headers())
                 
                 if login_response.status_code == 200:
                     # Check if login was successful (look for indicators)
@@ -166,15 +277,11 @@ class IMATSlotMonitor:
         
         return True  # Continue even if no login form found
 
-    def select_country(self, country='India'):
+    def select_country(self, soup, country='India'):
         """Handle country selection if required"""
         try:
             print(f"🌍 Selecting country: {country}")
             
-            # Get current page
-            response = self.session.get(self.imat_url, headers=self.get_fresh_headers())
-            soup = BeautifulSoup(response.text, 'html.parser')
-            
             # Look for country selection elements
             country_select = soup.find('select', {'name': lambda x: x and 'country' in x.lower()})
             country_form = soup.find('form', {'id': lambda x: x and 'country' in x.lower() if x else False})
@@ -184,9 +291,7 @@ class IMATSlotMonitor:
                 form = country_select.find_parent('form')
                 if form:
                     action = form.get('action', '')
-                    if not action.startswith('http'):
-                        base_url = '/'.join(self.imat_url.split('/')[:3])
-                        action = base_url + action
+                    action = urljoin(self.imat_url, action)
                     
                     # Find India option value
                     india_option = country_select.find('option', string=re.compile('India', re.I))
@@ -201,7 +306,7 @@ class IMATSlotMonitor:
                                 country_data[name] = value
                         
                         # Submit country selection
-                        country_response = self.session.post(action, data=country_data, headers=self.get_fresh_headers(form_submit=True))
+                        country_response = self.session.post(action, data=country_data, headers=self.get_form_headers())
                         
                         if country_response.status_code == 200:
                             print("✅ Country selected successfully")
@@ -213,11 +318,9 @@ class IMATSlotMonitor:
             for link in india_links:
                 href = link.get('href')
                 if href:
-                    if not href.startswith('http'):
-                        base_url = '/'.join(self.imat_url.split('/')[:3])
-                        href = base_url + href
+                    href = urljoin(self.imat_url, href)
                     
-                    country_response = self.session.get(href, headers=self.get_fresh_headers())
+                    country_response = self.session.get(href, headers=self.get_page_headers())
                     if country_response.status_code == 200:
                         print("✅ Country selected via link")
                         self.country_selected = True
@@ -228,32 +331,41 @@ class IMATSlotMonitor:
         
         return True  # Continue even if no country selection needed
 
-    def navigate_to_slot_page(self):
+    def probe_url(self, url):
+        """Return the status code for a candidate URL, or None if it cannot be reached"""
+        try:
+            # A HEAD is enough to rule out dead links; fall back to GET where HEAD is not allowed
+            response = self.session.head(url, headers=self.get_page_headers(), timeout=20, allow_redirects=True)
+            if response.status_code in (405, 501):
+                response = self.session.get(url, headers=self.get_page_headers(), timeout=20)
+            return response.status_code
+        except requests.exceptions.RequestException:
+            return None
+
+    def navigate_to_slot_page(self, soup):
         """Navigate to the actual slot booking/viewing page"""
         try:
             print("🎯 Navigating to slot booking page...")
             
-            response = self.session.get(self.imat_url, headers=self.get_fresh_headers())
-            soup = BeautifulSoup(response.text, 'html.parser')
-            
             # Look for slot booking links
             slot_keywords = ['slot', 'booking', 'appointment', 'schedule', 'exam center']
             
-            for keyword in slot_keywords:
-                # Look for links containing these keywords
-                links = soup.find_all('a', href=True, string=re.compile(keyword, re.I))
-                if not links:
-                    links = soup.find_all('a', href=re.compile(keyword, re.I))
-                
-                for link in links:
-                    href = link.get('href')
-                    if href:
-                        if not href.startswith('http'):
-                            base_url = '/'.join(self.imat_url.split('/')[:3])
-                            href = base_url + href
-                        
-                        slot_response = self.session.get(href, headers=self.get_fresh_headers())
-                        if slot_response.status_code == 200:
+            # Collect each matching link once, in keyword priority order
+            links = [
+                (f"{link.get_text()} {link['href']}".lower(), urljoin(self.imat_url, link['href']))
+                for link in soup.find_all('a', href=True)
+                if link['href']
+            ]
+            candidate_urls = list(dict.fromkeys(
+                url for keyword in slot_keywords for link_text, url in links if keyword in link_text
+            ))
+            
+            # Probe in priority-ordered batches and stop at the first batch with a live page
+            with ThreadPoolExecutor(max_workers=self.probe_workers) as executor:
+                for start in range(0, len(candidate_urls), self.probe_workers):
+                    batch = candidate_urls[start:start + self.probe_workers]
+                    for href, status_code in zip(batch, executor.map(self.probe_url, batch)):
+                        if status_code == 200:
                             self.slot_booking_url = href
                             print(f"✅ Found slot page: {href}")
                             return href
@@ -270,16 +382,32 @@ class IMATSlotMonitor:
         try:
             print("🚀 Initializing session...")
             
+            # The slot page may change with the session, so drop old validators
+            self._etag = None
+            self._last_modified = None
+            self._last_digest = None
+            
+            # Fetch the landing page once and share it between the steps
+            soup = self.fetch_landing_page()
+            
             # Step 1: Login if credentials provided
-            if not self.login_to_system():
+            if not self.login_to_system(soup):
                 return False
             
+            # Logging in changes what the landing page shows
+            if self.is_logged_in:
+                soup = self.fetch_landing_page()
+            
             # Step 2: Handle country selection
-            if not self.select_country():
+            if not self.select_country(soup):
                 return False
             
+            # Selecting a country changes what the landing page shows
+            if self.country_selected:
+                soup = self.fetch_landing_page()
+            
             # Step 3: Navigate to slot booking page
-            self.slot_booking_url = self.navigate_to_slot_page()
+            self.slot_booking_url = self.navigate_to_slot_page(soup)
             
             self.session_initialized = True
             print("✅ Session initialized successfully")
@@ -294,12 +422,10 @@ class IMATSlotMonitor:
         try:
             # Get current page
             current_url = self.slot_booking_url or self.imat_url
-            response = self.session.get(current_url, headers=self.get_fresh_headers())
+            response = self.session.get(current_url, headers=self.get_page_headers())
             
             # Check if we've been logged out or redirected
-            if ('login' in response.url.lower() or 
-                'signin' in response.url.lower() or 
-                'country' in response.url.lower()):
+            if self._redirect_re.search(response.url):
                 
                 print("⚠️ Session expired - reinitializing...")
                 return self.initialize_session()
@@ -336,29 +462,48 @@ class IMATSlotMonitor:
             # Make request while maintaining session
             response = self.session.get(
                 target_url, 
-                headers=self.get_fresh_headers(), 
+                headers=self.get_conditional_headers(), 
                 timeout=20,
                 allow_redirects=True
             )
             
+            # Back off when rate limited instead of hammering the server with a session re-init
+            if response.status_code in (403, 429, 503):
+                self._consecutive_rate_limits += 1
+                if response.status_code == 403:
+                    self._consecutive_forbidden += 1
+                    if self._consecutive_forbidden >= self.forbidden_reinit_after:
+                        print(f"⚠️ Access refused {self._consecutive_forbidden} times in a row - reinitializing session...")
+                        if self.initialize_session():
+                            # The fresh session ends the streak; the next check uses it
+                            self._consecutive_forbidden = 0
+                            self._consecutive_rate_limits = 0
+                    else:
+                        print("🐢 Access refused (Status: 403) - backing off")
+                else:
+                    self._consecutive_forbidden = 0
+                    
+                    # Honor the server's back-off signal
+                    retry_after = self.parse_retry_after(response) + random.uniform(0, 5)
+                    self._retry_not_before = time.monotonic() + retry_after
+                    print(f"🐢 Rate limited (Status: {response.status_code}) - retrying after {int(retry_after)}s")
+                return None
+            
             response.raise_for_status()
             
             # Check if we got redirected back to login/country selection
-            if ('login' in response.url.lower() or 
-                'signin' in response.url.lower() or 
-                'country' in response.url.lower()):
+            if self._redirect_re.search(response.url):
                 
                 print("⚠️ Detected redirect to login/country page - reinitializing session...")
                 if self.initialize_session():
                     # Retry the request
                     target_url = self.slot_booking_url or self.imat_url
-                    response = self.session.get(target_url, headers=self.get_fresh_headers(), timeout=20)
+                    response = self.session.get(target_url, headers=self.get_page_headers(), timeout=20)
                     response.raise_for_status()
                 else:
                     return None
             
-            print(f"✅ Page fetched successfully (Status: {response.status_code})")
-            return response.text
+            return self.page_content_or_unchanged(response)
             
         except requests.exceptions.RequestException as e:
             print(f"❌ Request error: {str(e)}")
@@ -369,9 +514,9 @@ class IMATSlotMonitor:
                 if self.initialize_session():
                     time.sleep(3)
                     target_url = self.slot_booking_url or self.imat_url
-                    response = self.session.get(target_url, headers=self.get_fresh_headers(), timeout=25)
+                    response = self.session.get(target_url, headers=self.get_page_headers(), timeout=25)
                     response.raise_for_status()
-                    return response.text
+                    return self.page_content_or_unchanged(response)
                 else:
                     return None
             except Exception as retry_e:
@@ -382,95 +527,133 @@ class IMATSlotMonitor:
             print(f"❌ Unexpected error fetching page: {str(e)}")
             return None
 
+    def parse_retry_after(self, response, default=60):
+        """Return the Retry-After delay in seconds (numeric or HTTP-date form)"""
+        value = response.headers.get('Retry-After', '')
+        try:
+            return max(0, int(value))
+        except ValueError:
+            pass
+        
+        try:
+            retry_at = parsedate_to_datetime(value)
+            return max(0, int((retry_at - datetime.now(retry_at.tzinfo)).total_seconds()))
+        except (TypeError, ValueError):
+            return default
+
+    def page_content_or_unchanged(self, response):
+        """Return the page body, or UNCHANGED if it is the same page as last time"""
+        # Any successful fetch (including session recovery) ends a rate-limit streak
+        self._consecutive_rate_limits = 0
+        self._consecutive_forbidden = 0
+        
+        if response.status_code == 304:
+            print("✅ Page not modified since last check (Status: 304)")
+            return UNCHANGED
+        
+        self._etag = response.headers.get('ETag')
+        self._last_modified = response.headers.get('Last-Modified')
+        
+        # Fall back to comparing the body when the server ignores conditional headers
+        digest = blake2b(response.content, digest_size=16).digest()
+        if digest == self._last_digest:
+            print("✅ Page content unchanged since last check")
+            return UNCHANGED
+        self._last_digest = digest
+        
+        print(f"✅ Page fetched successfully (Status: {response.status_code})")
+        return response.content
+
     def analyze_slot_status(self, html_content):
         """Analyze the HTML content to detect slot availability"""
         if not html_content:
             return {}
             
-        soup = BeautifulSoup(html_content, 'html.parser')
         slot_status = {}
         
-        # You'll need to customize these selectors based on the actual IMAT website structure
-        # Look for elements that contain city names and their status indicators
-        
+        # Fast path: when the first tag naming the city in its class or id carries a color itself,
+        # that is what the XPath detection would return too, so the page needn't be parsed.
+        # Comments, scripts and styles are blanked first so markup inside them can't match.
+        element_markup = self._non_element_re.sub(b' ', html_content)
         for city in self.cities:
-            # Common patterns to look for:
-            # 1. Colored dots/circles (red, yellow, green)
-            # 2. Status text ("Full", "Available", "Limited")
-            # 3. Class names indicating status
-            
-            city_status = self.detect_city_status(soup, city)
-            slot_status[city] = city_status
+            status = self.extract_status_from_tag(self._city_tag_re[city].search(element_markup))
+            if status:
+                slot_status[city] = status
+        
+        missing_cities = [city for city in self.cities if city not in slot_status]
+        if missing_cities:
+            try:
+                doc = lxml.html.fromstring(html_content)
+            except etree.ParserError:
+                # Nothing parseable left once the fast path came up empty
+                return {city: slot_status.get(city, 'unknown') for city in self.cities}
+            # Page text extracted once per poll (in C) and shared by every city's keyword fallback
+            text_lower = ' '.join(doc.itertext()).lower()
+            
+            # You'll need to customize these selectors based on the actual IMAT website structure
+            # Look for elements that contain city names and their status indicators
+            
+            for city in missing_cities:
+                # Common patterns to look for:
+                # 1. Colored dots/circles (red, yellow, green)
+                # 2. Status text ("Full", "Available", "Limited")
+                # 3. Class names indicating status
+                
+                slot_status[city] = self.detect_city_status(doc, city, text_lower)
             
-        return slot_status
+        return {city: slot_status[city] for city in self.cities}
+
+    def extract_status_from_tag(self, tag_match):
+        """Return the color in a raw opening tag's own class/style attributes, if any"""
+        if not tag_match:
+            return None
+        
+        attrs = {name.lower(): value for name, _, value in self._tag_attr_re.findall(tag_match.group())}
+        for name in (b'class', b'style'):
+            match = self._color_re.search(attrs.get(name, b'').decode('latin-1'))
+            if match:
+                return self.COLOR_CODES.get(match.group().lower(), match.group().lower())
+        
+        return None
 
-    def detect_city_status(self, soup, city):
+    def detect_city_status(self, doc, city, text_lower):
         """Detect status for a specific city"""
-        # Method 1: Look for colored elements
-        city_patterns = [
-            f"*[class*='{city}']",
-            f"*[id*='{city}']",
-            f"*:contains('{city.title()}')",
-            f"*:contains('{city.upper()}')"
-        ]
-        
-        for pattern in city_patterns:
-            try:
-                elements = soup.select(pattern)
-                for element in elements:
-                    # Check for color indicators in style, class, or data attributes
-                    status = self.extract_status_from_element(element)
-                    if status:
-                        return status
-            except:
-                continue
+        # Method 1: Look for colored elements in (or under) elements whose class or id mentions the city
+        for element in self._city_element_xpath(doc, city=city):
+            # Check for color indicators in style, class, or data attributes
+            status = self.extract_status_from_element(element)
+            if status:
+                return status
+        
+        # Elements whose text mentions the city (checked from the nearest parent outwards)
+        for parent in self._city_text_parent_xpath(doc, city=city):
+            for element in (parent, *parent.iterancestors()):
+                status = self.extract_status_from_element(element)
+                if status:
+                    return status
         
         # Method 2: Look for general status indicators near city names
-        text_content = soup.get_text().lower()
-        if city in text_content:
+        if city in text_lower:
             # Look for status keywords near the city name
-            status_keywords = {
-                'available': 'green',
-                'limited': 'yellow',
-                'full': 'red',
-                'closed': 'red'
-            }
-            
-            for keyword, color in status_keywords.items():
-                if keyword in text_content:
+            for keyword, color in self.STATUS_KEYWORDS.items():
+                if keyword in text_lower:
                     return color
         
         return 'unknown'
 
     def extract_status_from_element(self, element):
         """Extract status from HTML element based on common patterns"""
-        # Check class names for color indicators
-        class_list = element.get('class', [])
-        for class_name in class_list:
-            class_lower = class_name.lower()
-            if any(color in class_lower for color in ['red', 'green', 'yellow']):
-                if 'red' in class_lower:
-                    return 'red'
-                elif 'green' in class_lower:
-                    return 'green'
-                elif 'yellow' in class_lower:
-                    return 'yellow'
-        
-        # Check style attribute for colors
-        style = element.get('style', '')
-        if style:
-            if 'red' in style.lower() or '#ff0000' in style.lower() or 'rgb(255,0,0)' in style.lower():
-                return 'red'
-            elif 'green' in style.lower() or '#00ff00' in style.lower() or 'rgb(0,255,0)' in style.lower():
-                return 'green'
-            elif 'yellow' in style.lower() or '#ffff00' in style.lower() or 'rgb(255,255,0)' in style.lower():
-                return 'yellow'
+        # Check class names and style attribute for color indicators
+        for value in (element.get('class', ''), element.get('style', '')):
+            match = self._color_re.search(value)
+            if match:
+                return self.COLOR_CODES.get(match.group().lower(), match.group().lower())
         
         # Check data attributes
-        for attr_name, attr_value in element.attrs.items():
+        for attr_name, attr_value in element.attrib.items():
             if 'status' in attr_name.lower() or 'color' in attr_name.lower():
-                if any(color in str(attr_value).lower() for color in ['red', 'green', 'yellow']):
-                    return str(attr_value).lower()
+                if self._color_re.search(attr_value):
+                    return attr_value.lower()
         
         return None
 
@@ -500,7 +683,7 @@ class IMATSlotMonitor:
         message += "📍 <b>Slots may be available in:</b>\n\n"
         
         for change in changes:
-            city_name = change['city'].title()
+            city_name = self.city_titles[change['city']]
             status_emoji = "🟢" if change['current'] == 'green' else "🟡"
             message += f"{status_emoji} <b>{city_name}</b> - Status changed to {change['current'].upper()}\n"
         
@@ -509,6 +692,66 @@ class IMATSlotMonitor:
         
         return message
 
+    def get_wait_time(self):
+        """Pick a jittered delay before the next check, backing off while rate limited"""
+        current_hour = datetime.now().hour
+        
+        # Check more frequently during business hours (9 AM - 6 PM)
+        if 9 <= current_hour <= 18:
+            median_wait = self.business_hours_median_wait
+            print(f"🕘 Business hours - checking every ~{median_wait / 60:g} minutes")
+        else:
+            median_wait = self.off_hours_median_wait
+            print(f"🌙 Off hours - checking every ~{median_wait / 60:g} minutes")
+        
+        # Log-normal jitter keeps the polling pattern irregular around the median
+        wait_time = max(60, int(random.lognormvariate(math.log(median_wait), 0.4)))
+        
+        if self._consecutive_rate_limits:
+            wait_time *= 2 ** min(self._consecutive_rate_limits, 5)
+            print(f"🐢 Rate limited {self._consecutive_rate_limits} time(s) in a row - backing off")
+        
+        return wait_time
+
+    def retry_after_remaining(self):
+        """Whole seconds left until the server's Retry-After deadline (0 if none is pending)"""
+        return max(0, math.ceil(self._retry_not_before - time.monotonic()))
+
+    def is_backing_off(self):
+        """True while rate limited or a Retry-After deadline is still pending"""
+        return self._consecutive_rate_limits > 0 or self.retry_after_remaining() > 0
+
+    def request_check(self):
+        """Run the next check now instead of waiting out the current delay (ignored while backing off)"""
+        if self.is_backing_off():
+            print("🐢 Immediate check ignored - backing off after rate limiting")
+            return False
+        
+        self._wake.set()
+        return True
+
+    def stop(self):
+        """Ask the monitor loop to exit after the current check (safe to call from a signal handler)"""
+        # Only a flag: Event.set() could deadlock if the signal lands while this thread holds its lock
+        self._stop_requested = True
+
+    def wait_for_next_check(self, wait_time):
+        """Sleep until the next check is due, until woken by request_check, or until stop() is seen"""
+        deadline = time.monotonic() + wait_time
+        while not self._stop_requested:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return
+            
+            # Wait in short slices so a stop request is noticed promptly
+            if self._wake.wait(timeout=min(remaining, self.stop_poll_interval)):
+                self._wake.clear()
+                
+                # A check requested before the back-off started must not cut it short
+                if not self.is_backing_off():
+                    print("⚡ Immediate check requested")
+                    return
+
     def run_monitor(self):
         """Main monitoring loop with enhanced refreshing"""
         print("🚀 Starting IMAT Slot Monitor with Smart Refresh...")
@@ -517,21 +760,29 @@ class IMATSlotMonitor:
         print("🔄 Auto-refresh enabled with cache-busting")
         
         # Send startup notification
-        startup_msg = "🤖 IMAT Slot Monitor started!\n\n📊 Monitoring Chennai and Delhi slots\n⏰ Checking every 5 minutes\n🔄 Smart refresh enabled"
+        startup_msg = f"🤖 IMAT Slot Monitor started!\n\n📊 Monitoring {' and '.join(self.city_titles.values())} slots\n⏰ Checking every ~{self.business_hours_median_wait / 60:g} min (9 AM - 6 PM) / ~{self.off_hours_median_wait / 60:g} min otherwise\n🔄 Smart refresh enabled"
         self.send_telegram_message(startup_msg)
         
         consecutive_failures = 0
         last_successful_check = datetime.now()
         
-        while True:
+        while not self._stop_requested:
             try:
+                check_started = time.monotonic()
                 current_time = datetime.now()
                 print(f"\n⏰ {current_time.strftime('%Y-%m-%d %H:%M:%S')} - Checking slots (Check #{self.request_counter + 1})...")
                 
                 # Fetch and analyze page with refreshing
                 html_content = self.get_page_content()
                 
-                if html_content:
+                if html_content is UNCHANGED:
+                    # Nothing to parse - the previous status still holds
+                    consecutive_failures = 0
+                    last_successful_check = current_time
+                    
+                    print(f"📊 Current status: {self.previous_state} (unchanged)")
+                    
+                elif html_content:
                     current_status = self.analyze_slot_status(html_content)
                     consecutive_failures = 0
                     last_successful_check = current_time
@@ -545,7 +796,7 @@ class IMATSlotMonitor:
                         print(f"🚨 Changes detected: {changes}")
                         notification_message = self.format_notification_message(changes)
                         if notification_message:
-                            self.send_telegram_message(notification_message)
+                            self.notify(notification_message)
                     else:
                         print("✅ No changes detected")
                     
@@ -559,33 +810,52 @@ class IMATSlotMonitor:
                     # Send alert if too many consecutive failures
                     if consecutive_failures >= 3:
                         failure_msg = f"⚠️ IMAT Monitor Alert\n\n❌ Failed to fetch page {consecutive_failures} times in a row\n🕒 Last successful check: {last_successful_check.strftime('%H:%M:%S')}\n\n🔄 Will keep trying..."
-                        self.send_telegram_message(failure_msg)
+                        self.notify(failure_msg)
                         consecutive_failures = 0  # Reset to avoid spam
                 
-                # Dynamic wait time based on time of day
-                current_hour = datetime.now().hour
-                
-                # Check more frequently during business hours (9 AM - 6 PM)
-                if 9 <= current_hour <= 18:
-                    wait_time = 180  # 3 minutes during business hours
-                    print("🕘 Business hours - checking every 3 minutes")
-                else:
-                    wait_time = 300  # 5 minutes during off hours
-                    print("🌙 Off hours - checking every 5 minutes")
+                # The delay runs from the start of this check, so fetch and analysis time is not added on top
+                wait_time = max(0, self.get_wait_time() - int(time.monotonic() - check_started))
                 
-                print(f"⏳ Waiting {wait_time//60} minutes before next check...")
-                time.sleep(wait_time)
+                # Never come back sooner than the server asked us to, however long this check took
+                wait_time = max(wait_time, self.retry_after_remaining())
+                print(f"⏳ Waiting {wait_time // 60}m {wait_time % 60}s before next check...")
+                self.wait_for_next_check(wait_time)
                 
             except KeyboardInterrupt:
                 print("\n🛑 Monitor stopped by user")
                 stop_msg = "🛑 IMAT Slot Monitor stopped by user"
                 self.send_telegram_message(stop_msg)
-                break
+                return
             except Exception as e:
                 print(f"❌ Error in monitoring loop: {str(e)}")
                 error_msg = f"⚠️ IMAT Monitor Error\n\n❌ {str(e)}\n\n🔄 Restarting in 2 minutes..."
                 self.send_telegram_message(error_msg)
-                time.sleep(120)  # Wait 2 minutes before retrying
+                self.wait_for_next_check(120)  # Wait 2 minutes before retrying
+        
+        print("\n🛑 Monitor stopped")
+        self.send_telegram_message("🛑 IMAT Slot Monitor stopped")
+
+def start_health_server(monitor=None):
+    """Start a simple HTTP server for Render health checks (GET /check triggers an immediate check)"""
+    class HealthHandler(http.server.SimpleHTTPRequestHandler):
+        def do_GET(self):
+            if self.path == '/check' and monitor:
+                body = b'Check scheduled' if monitor.request_check() else b'Check deferred - backing off'
+            else:
+                body = b'IMAT Monitor is running!'
+            
+            self.send_response(200)
+            self.send_header('Content-type', 'text/plain')
+            self.end_headers()
+            self.wfile.write(body)
+    
+    try:
+        port = int(os.getenv('PORT', 8080))
+        with socketserver.TCPServer(("", port), HealthHandler) as httpd:
+            print(f"Health server running on port {port}")
+            httpd.serve_forever()
+    except Exception as e:
+        print(f"Health server error: {e}")
 
 def main():
     # Validate environment variables
@@ -599,47 +869,15 @@ def main():
     
     # Start monitoring
     monitor = IMATSlotMonitor()
+    
+    # Keep the service alive on Render with a health server in a background thread
+    health_thread = threading.Thread(target=start_health_server, args=(monitor,), daemon=True)
+    health_thread.start()
+    
+    # Shut down cleanly when the platform stops the service
+    signal.signal(signal.SIGTERM, lambda signum, frame: monitor.stop())
+    
     monitor.run_monitor()
 
 if __name__ == "__main__":
     main()
-
-# Keep the service alive on Render
-import threading
-import http.server
-import socketserver
-
-def start_health_server():
-    """Start a simple HTTP server for Render health checks"""
-    class HealthHandler(http.server.SimpleHTTPRequestHandler):
-        def do_GET(self):
-            self.send_response(200)
-            self.send_header('Content-type', 'text/plain')
-            self.end_headers()
-            self.wfile.write(b'IMAT Monitor is running!')
-    
-    try:
-        port = int(os.getenv('PORT', 8080))
-        with socketserver.TCPServer(("", port), HealthHandler) as httpd:
-            print(f"Health server running on port {port}")
-            httpd.serve_forever()
-    except Exception as e:
-        print(f"Health server error: {e}")
-
-# Start health server in background thread
-health_thread = threading.Thread(target=start_health_server, daemon=True)
-health_thread.start()
-
-# Run main function
-main()
-from flask import Flask
-from threading import Thread
-
-app = Flask(__name__)
-
-@app.route('/')
-def home():
-    return "Bot is running!"
-
-# Start the web server in background
-Thread(target=lambda: app.run(host='0.0.0.0', port=10000)).start()
\ No newline at end of file
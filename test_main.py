@@ -0,0 +1,67 @@
+import lxml.html
+
+from main import IMATSlotMonitor
+
+
+def analyze(html):
+    return IMATSlotMonitor().analyze_slot_status(html.encode())
+
+
+def test_color_on_the_city_element_itself():
+    html = '<ul><li class="chennai red">Chennai</li><li class="delhi green">Delhi</li></ul>'
+    assert analyze(html) == {'chennai': 'red', 'delhi': 'green'}
+
+
+def test_unrelated_color_before_the_city_element_is_ignored():
+    html = (
+        '<html><head><title>Chennai exam centre</title></head><body>'
+        '<div class="banner-green">Welcome</div>'
+        '<div id="chennai" style="color:red">Chennai</div>'
+        '</body></html>'
+    )
+    assert analyze(html)['chennai'] == 'red'
+
+
+def test_rgb_style_on_the_city_element():
+    html = '<div id="chennai" style="background:rgb(255,0,0)"></div><div class="status-green">Delhi</div>'
+    assert analyze(html)['chennai'] == 'red'
+
+
+def test_falls_back_to_dom_for_colored_descendants():
+    html = '<div class="city-chennai"><span class="dot-yellow"></span></div><p class="green">other</p>'
+    assert analyze(html)['chennai'] == 'yellow'
+
+
+def dom_status(monitor, html):
+    doc = lxml.html.fromstring(html)
+    text_lower = ' '.join(doc.itertext()).lower()
+    return {city: monitor.detect_city_status(doc, city, text_lower) for city in monitor.cities}
+
+
+def test_fast_path_agrees_with_dom_detection():
+    html = '<li class="chennai red">Chennai</li><li class="delhi green">Delhi</li>'
+    monitor = IMATSlotMonitor()
+    assert monitor.analyze_slot_status(html.encode()) == dom_status(monitor, html)
+
+
+def test_city_markup_inside_a_comment_is_ignored():
+    html = '<ul><!-- <li class="chennai green"> --><li class="chennai red">Chennai</li></ul>'
+    monitor = IMATSlotMonitor()
+    assert monitor.analyze_slot_status(html.encode())['chennai'] == 'red'
+    assert monitor.analyze_slot_status(html.encode()) == dom_status(monitor, html)
+
+
+def test_city_markup_inside_a_script_is_ignored():
+    html = (
+        '<html><head><script>var row = \'<li class="chennai green">\';</script></head>'
+        '<body><ul><li class="chennai red">Chennai</li></ul></body></html>'
+    )
+    monitor = IMATSlotMonitor()
+    assert monitor.analyze_slot_status(html.encode())['chennai'] == 'red'
+    assert monitor.analyze_slot_status(html.encode()) == dom_status(monitor, html)
+
+
+def test_city_markup_inside_a_style_is_ignored():
+    html = '<style>/* <div id="chennai" class="green"> */</style><div id="chennai" style="color:red"></div>'
+    monitor = IMATSlotMonitor()
+    assert monitor.analyze_slot_status(html.encode())['chennai'] == 'red'